@@ -1,43 +1,54 @@
 from __future__ import annotations
 import asyncio
-import time
-import re
+import os
+import sys
 
 from queue import Queue, Empty
 from pathlib import Path
-from typing import Optional
 from threading import Thread
 
 from loguru import logger
+from watchfiles import awatch, Change
 
-from semblance.control_messages import AbstractControlMessage, DummyMessage, KillMessage
+try:
+    # Optional - uvloop gives a cheaper event loop where it's installed (it doesn't support Windows, where asyncio
+    # already defaults to the IOCP based proactor loop).
+    from uvloop import new_event_loop
+except ImportError:
+    from asyncio import new_event_loop
+
+from semblance.spsc_queue import SPSCQueue
+from semblance.control_messages import AbstractControlMessage, ControlKind, DummyMessage, KillMessage
 from semblance.game_event_messages import (AbstractGameEventMessage,
                                            ConsoleEventMessage,
                                            ConsoleChatMessage,
                                            ConsoleKillMessage,
-                                           CONSOLE_KILL_REX,
-                                           CONSOLE_CHAT_REX)
+                                           CONSOLE_LINE_REX)
 
 
 def tf2_console_handler(reader: TF2ConsoleReader) -> None:
     logger.info("Console Handler starting...")
-    async_el = asyncio.new_event_loop()
 
     try:
-        async_el.run_until_complete(reader.start_watching())
+        # asyncio.run owns the loop's lifetime, including shutting down async generators and the default executor
+        asyncio.run(reader.start_watching(), loop_factory=new_event_loop)
     except Exception as e:
-        logger.error(f"Console Reader encountered an exception during operation: {e}")
+        logger.error("Console Reader encountered an exception during operation: {}", e)
     finally:
-        logger.debug(f"Ending async event loop...")
-        async_el.stop()
-        async_el.close()
         logger.success("Console Handler exiting...")
 
 
+# Most we read (and decode, and parse) from the console.log in one go
+_READ_CHUNK_SIZE: int = 256 * 1024
+# Put on the control queue by the reader itself when it stops watching, to release its control thread
+_STOP_CONTROL_THREAD = object()
+
+
 class TF2ConsoleReader:
     # Path to the console.log file
     file_path: Path = None
-    output_queue: Queue[AbstractGameEventMessage] = None
+    # Each item is the batch of messages parsed from one chunk read from the file
+    output_queue: SPSCQueue[list[AbstractGameEventMessage]] = None
     control_queue: Queue[AbstractControlMessage] = None
 
     # File watching stuff
@@ -46,7 +57,7 @@ class TF2ConsoleReader:
 
     def __init__(
             self,
-            output_queue: Queue[AbstractGameEventMessage],
+            output_queue: SPSCQueue[list[AbstractGameEventMessage]],
             control_queue: Queue[AbstractControlMessage],
             file_path: Path
     ) -> None:
@@ -54,69 +65,144 @@ class TF2ConsoleReader:
         self.output_queue = output_queue
         self.control_queue = control_queue
 
-    def _check_control(self) -> Optional[AbstractControlMessage]:
-        try:
-            _control_msg = self.control_queue.get(block=False)
-            return _control_msg  # Remember to use task_done later!!
-        except Empty:
-            return None  # no control messages right now...
+    def _watch_control(self, loop: asyncio.AbstractEventLoop, stop_event: asyncio.Event) -> None:
+        # Blocks on the control queue in its own thread, so the watcher never has to poll it. A KillMessage trips the
+        # stop event, which ends the `awatch` iteration in `start_watching`. The thread itself only exits once
+        # `start_watching` is done (for whatever reason) and puts _STOP_CONTROL_THREAD on the queue, so it never
+        # outlives the watcher and can't take a later reader's messages.
+        while True:
+            _msg = self.control_queue.get(block=True)
+            if _msg is _STOP_CONTROL_THREAD:
+                self.control_queue.task_done()
+                break
+            _kind = getattr(_msg, "kind", None)
+            if _kind == ControlKind.KILL:
+                logger.info("KillMessage received, breaking watcher...")
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(stop_event.set)
+                self.control_queue.task_done()
+            elif _kind == ControlKind.DUMMY:
+                # DummyMessage, ignore it! (but still make sure to mark task_done)
+                self.control_queue.task_done()
+            else:
+                # do nothing
+                self.control_queue.task_done()
+
+    def _parse_lines(self, lines: list[str]) -> list[AbstractGameEventMessage]:
+        _batch = []
+        _match = CONSOLE_LINE_REX.match
+        _source = self.file_path.name
+        _gen = type(self).__name__
+        for line in lines:
+            # isspace() checks in place, where strip() would copy every line just to test it for emptiness
+            if not line or line.isspace():
+                continue
+            # Chat needs a ':' and kills need 'killed' - most console noise has neither, and a substring
+            # check is far cheaper than letting the regex backtrack over the whole line to find that out.
+            line_match = _match(line) if ":" in line or "killed" in line else None
+            if line_match is None:
+                _msg = ConsoleEventMessage(line, _source, _gen)
+            elif line_match.lastgroup == "chat":
+                _msg = ConsoleChatMessage(line_match, _source, _gen)
+            else:
+                _msg = ConsoleKillMessage(line_match, _source, _gen)
+
+            _batch.append(_msg)
+        return _batch
 
     async def start_watching(self) -> None:
-        self._seek_offset = self.file_path.stat().st_size
-        # We read the file as UTF8, but in old Source 1 games most files are written with UTF16 or something not quite
-        # UTF8, so while most reads will work (because the UTF8 codec contains most of the UTF16 codec), some will fail,
-        # so we ignore the decode errors and hope to pass on without issue.
-        _file_handle = open(self.file_path, 'r', encoding='utf8', errors='ignore')
-        _file_handle.seek(self._seek_offset)
-
-        while True:
-            _size = self.file_path.stat().st_size
-            if _file_handle.tell() > _size:
-                # If file gets shrunk while we have it open, reset cursor to end
-                _file_handle.seek(_size)
-            _data = _file_handle.read().strip()
-
-            if _data:
-                for line in _data.splitlines():
-                    if len(line.strip()) < 1:
+        # The log is read as raw bytes from a byte offset we track ourselves, so that each change only decodes the
+        # bytes that were appended (and the shrink check compares real byte positions, not a text-mode tell() cookie).
+        # Unbuffered, so reads go straight from the descriptor into our own reusable buffer, without BufferedReader
+        # copying through its internal buffer first.
+        _file_handle = open(self.file_path, 'rb', buffering=0)
+        self._seek_offset = os.fstat(_file_handle.fileno()).st_size
+        _buffer = bytearray(_READ_CHUNK_SIZE)
+        _view = memoryview(_buffer)
+        # Bytes after the last newline we've read - a line the game hasn't finished writing yet.
+        _partial = b""
+
+        _control_thread = None
+        try:
+            _stop_event = asyncio.Event()
+            _control_thread = Thread(
+                target=self._watch_control,
+                name="TF2ConsoleControlThread",
+                args=(asyncio.get_running_loop(), _stop_event),
+                daemon=True
+            )
+            _control_thread.start()
+
+            # Only wake up when the OS tells us the console.log was written to. The debounce keeps the worst case
+            # latency in line with the old 100ms poll when the game is writing continuously.
+            _target = self.file_path.resolve()
+            async for _changes in awatch(
+                    _target.parent,
+                    watch_filter=lambda change, path: change == Change.modified and Path(path) == _target,
+                    debounce=100,
+                    step=10,
+                    stop_event=_stop_event,
+                    recursive=False
+            ):
+                # fstat the descriptor we already hold, rather than re-resolving the path on every change.
+                _size = os.fstat(_file_handle.fileno()).st_size
+                if self._seek_offset > _size:
+                    # If file gets shrunk while we have it open, reset cursor to end
+                    self._seek_offset = _size
+                    _partial = b""
+                if self._seek_offset == _size:
+                    continue
+
+                _file_handle.seek(self._seek_offset)
+                # Drain in bounded chunks, so catching up on a large backlog (e.g. after the game dumped a lot of
+                # output at once) never decodes and parses megabytes in one go.
+                while not _stop_event.is_set():
+                    _read = _file_handle.readinto(_buffer)
+                    if not _read:
+                        break
+                    self._seek_offset += _read
+
+                    _end = _buffer.rfind(b"\n", 0, _read)
+                    if _end < 0:
+                        _partial += _view[:_read]
                         continue
-                    chat_match = re.match(CONSOLE_CHAT_REX, line)
-                    kill_match = re.match(CONSOLE_KILL_REX, line)
-                    if chat_match:
-                        _msg = ConsoleChatMessage(chat_match, self.file_path.name, self.__class__.__name__)
-                    elif kill_match:
-                        _msg = ConsoleKillMessage(kill_match, self.file_path.name, self.__class__.__name__)
-                    else:
-                        _msg = ConsoleEventMessage(line, self.file_path.name, self.__class__.__name__)
-
-                    self.output_queue.put(
-                        _msg,
-                        block=True
-                    )
 
-            _msg = self._check_control()
-            if _msg:
-                if isinstance(_msg, KillMessage):
-                    logger.info(f"KillMessage received, breaking watcher...")
-                    self.control_queue.task_done()
-                    break
-                elif isinstance(_msg, DummyMessage):
-                    # DummyMessage, ignore it! (but still make sure to mark task_done)
-                    self.control_queue.task_done()
-                else:
-                    # do nothing
-                    self.control_queue.task_done()
+                    # We read the file as UTF8, but in old Source 1 games most files are written with UTF16 or
+                    # something not quite UTF8, so while most reads will work (because the UTF8 codec contains most of
+                    # the UTF16 codec), some will fail, so we ignore the decode errors and hope to pass on without
+                    # issue.
+                    # Without a partial line to prepend, decode straight out of the read buffer.
+                    if _partial:
+                        _text = (_partial + _view[:_end]).decode('utf8', errors='ignore')
+                    else:
+                        _text = str(_view[:_end], 'utf8', 'ignore')
+                    _partial = bytes(_view[_end + 1:_read])
 
-            await asyncio.sleep(0.1)
+                    _batch = self._parse_lines(_text.splitlines())
+                    if _batch:
+                        # One put per chunk, rather than one for every line
+                        self.output_queue.put(_batch)
 
-        _file_handle.close()
-        logger.info(f"Exiting file watching loop...")
+                    # Let anything else on the loop run between chunks
+                    await asyncio.sleep(0)
+        finally:
+            _file_handle.close()
+            if _control_thread is not None:
+                # However the watch ended, take the control thread down with it
+                self.control_queue.put(_STOP_CONTROL_THREAD)
+                _control_thread.join()
+        logger.info("Exiting file watching loop...")
 
 
 def main():
+    # Hand log records to loguru's background worker, so the watcher threads never block on writing to the sink - and
+    # only from INFO up, so DEBUG records aren't formatted and queued just to be thrown away.
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", enqueue=True)
+
     _control_queue = Queue()
     _control_queue.put(DummyMessage("MainTestThread-init"))
-    _output_queue = Queue()
+    _output_queue = SPSCQueue()
     # G
     _path = Path("G:\\SteamLibrary\\steamapps\\common\\Team Fortress 2\\tf\\console.log")
     _watcher = TF2ConsoleReader(_output_queue, _control_queue, _path)
@@ -132,16 +218,16 @@ def main():
     try:
         while True:
             try:
-                _msg = _output_queue.get(block=False)
-                print(_msg)
-                _output_queue.task_done()
+                # Wakes as soon as the reader puts a batch - the timeout only bounds how long a KeyboardInterrupt can
+                # take to be noticed.
+                _batch = _output_queue.get(timeout=0.5)
+                for _msg in _batch:
+                    print(_msg)
             except Empty:
                 # no messages...
                 pass
-
-            time.sleep(0.1)
     except KeyboardInterrupt:
-        logger.info(f"Keyboard interrupt detected, exiting...")
+        logger.info("Keyboard interrupt detected, exiting...")
 
     if _thread.is_alive():
         # If the thread has died (due to some error that wasn't handled), nothing will consume the kill message,
@@ -149,7 +235,7 @@ def main():
         _control_queue.put(KillMessage("ConsoleHandlerMainTestLoop"), block=True)
         _control_queue.join()
     else:
-        logger.warning(f"We detected that the ConsoleHandler thread died at some point... exiting.")
+        logger.warning("We detected that the ConsoleHandler thread died at some point... exiting.")
 
     # If the thread has died prematurely, we can still join it (and should - for memory management reasons)
     _thread.join()
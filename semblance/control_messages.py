@@ -1,22 +1,36 @@
 from abc import ABC, abstractmethod
+from enum import IntEnum, auto
 from typing import Any
 
 
+class ControlKind(IntEnum):
+    KILL = auto()
+    DUMMY = auto()
+
+
 class AbstractControlMessage(ABC):
-    value: Any = None  # the value for the message (not all messages will define this)
-    generator: str = None  # The component responsible for creating this instance of the message
-    name: str = None  # the name of the message (easier to compare than the message class)
+    __slots__ = ("value", "generator", "name")
+    kind: ControlKind  # fixed per message class - dispatch on this rather than isinstance checks
+    value: Any  # the value for the message (not all messages will define this)
+    generator: str  # The component responsible for creating this instance of the message
+    name: str  # the name of the message (easier to compare than the message class)
 
 
 class KillMessage(AbstractControlMessage):
-    name = "Kill"
+    __slots__ = ()
+    kind = ControlKind.KILL
 
     def __init__(self, generator: str) -> None:
+        self.value = None
         self.generator = generator
+        self.name = "Kill"
 
 
 class DummyMessage(AbstractControlMessage):
-    name = "NOPMessage"
+    __slots__ = ()
+    kind = ControlKind.DUMMY
 
     def __init__(self, generator: str) -> None:
+        self.value = None
         self.generator = generator
+        self.name = "NOPMessage"
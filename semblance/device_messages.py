@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from enum import Enum, auto
 from typing import Any
 
+from loguru import logger
+
 
 class ActuatorTypes(Enum):
     NORMAL = auto()
@@ -11,26 +13,33 @@ class ActuatorTypes(Enum):
 
 
 class AbstractDeviceMessage(ABC):
-    target: Any = None  # abstract definition of a 'target' for this given value
-    value: Any = None  # the value for the message (not all messages will define this)
-    generator: str = None  # The component responsible for creating this instance of the message
-    name: str = None  # the name of the message (easier to compare than the message class)
+    __slots__ = ("target", "value", "generator", "name")
+    target: Any  # abstract definition of a 'target' for this given value
+    value: Any  # the value for the message (not all messages will define this)
+    generator: str  # The component responsible for creating this instance of the message
+    name: str  # the name of the message (easier to compare than the message class)
 
 
 class NormalActuatorSetIntensityMessage(AbstractDeviceMessage):
-    target: ActuatorTypes = ActuatorTypes.NORMAL
-    name = "SetNormalActuatorIntensity(?)"
+    __slots__ = ()
 
     def __init__(self, value: float, generator: str) -> None:
+        # Clamped once here, so the handler can pass the value straight on to every actuator
+        if not 0.0 <= value <= 1.0:
+            logger.warning("given intensity value {} is out of range, clamping!", value)
+            value = max(0.0, min(1.0, value))
+
+        self.target = ActuatorTypes.NORMAL
         self.value = value
         self.generator = generator
-        self.name = self.name.replace("?", f"{value}")
+        self.name = f"SetNormalActuatorIntensity({value})"
 
 
 class NormalActuatorGetIntensityMessage(AbstractDeviceMessage):
-    target: ActuatorTypes = ActuatorTypes.ANY
-    name = "GetNormalActuatorIntensity"
+    __slots__ = ()
 
     def __init__(self, value: float, generator: str) -> None:
+        self.target = ActuatorTypes.ANY
         self.value = value
         self.generator = generator
+        self.name = "GetNormalActuatorIntensity"
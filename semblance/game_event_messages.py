@@ -1,51 +1,76 @@
 import re
+import sys
 
 from abc import ABC
+from enum import IntEnum, auto
 from typing import Any
 
 from semblance.steam_id import SteamID, SteamIDException
 
-# Capture groups: [killer] [victim] [weapon] [crit?]
-CONSOLE_KILL_REX: re.Pattern = re.compile(r"^(.*)\skilled\s(.*)\swith\s(.*)\.(\s\(crit\))?$")
-# Capture groups: [dead?] [team?] [author] [message]
-CONSOLE_CHAT_REX: re.Pattern = re.compile(r"^(\*DEAD\*)?\s*(\(TEAM\))?\s*(.*)\s?:\s{1,2}(.*)$")
+# Both patterns are written so a hostile line (e.g. someone's chat message) can't make them backtrack for ages.
+# Named groups: [killer] [victim] [weapon] [crit?]
+# The lookahead rejects anything not ending in '.'/'. (crit)' in one pass, before the greedy killer/victim/weapon
+# groups start trying every ' killed '/' with ' split of the line.
+_KILL_PATTERN: str = (r"(?=.*\.(?:\s\(crit\))?$)"
+                      r"(?P<killer>.*)\skilled\s(?P<victim>.*)\swith\s(?P<weapon>.*)\.(?P<crit>\s\(crit\))?")
+# Named groups: [dead?] [team?] [author] [content]
+# The prefix is possessive - giving back '*DEAD*', '(TEAM)' or leading whitespace never lets a line match that
+# otherwise wouldn't, and without it a long run of spaces is retried in every split between the two \s* (cubic time).
+_CHAT_PATTERN: str = r"(?P<dead>\*DEAD\*)?+\s*+(?P<team>\(TEAM\))?+\s*+(?P<author>.*)\s?:\s{1,2}(?P<content>.*)"
+
+CONSOLE_KILL_REX: re.Pattern = re.compile(rf"^{_KILL_PATTERN}$")
+CONSOLE_CHAT_REX: re.Pattern = re.compile(rf"^{_CHAT_PATTERN}$")
+# Both of the above in a single pass - chat wins if a line could be both. `lastgroup` is 'chat' or 'kill' on a match.
+CONSOLE_LINE_REX: re.Pattern = re.compile(rf"^(?:(?P<chat>{_CHAT_PATTERN})|(?P<kill>{_KILL_PATTERN}))$")
+
+
+class GameEventKind(IntEnum):
+    EVENT = auto()
+    CHAT = auto()
+    KILL = auto()
 
 
 class AbstractGameEventMessage(ABC):
-    value: Any = None  # the value for the message (not all messages will define this)
-    generator: str = None  # The component responsible for creating this instance of the message
-    name: str = None  # the name of the message (easier to compare than the message class)
-    source: str = None  # the source of the game event message content
+    __slots__ = ("value", "generator", "name", "source")
+    kind: GameEventKind  # fixed per message class - dispatch on this rather than isinstance checks
+    value: Any  # the value for the message (not all messages will define this)
+    generator: str  # The component responsible for creating this instance of the message
+    name: str  # the name of the message (easier to compare than the message class)
+    source: str  # the source of the game event message content
 
 
 class ConsoleEventMessage(AbstractGameEventMessage):
-    value: str = None  # The string of the console event
-    name = "ConsoleEventMessage(?)"
+    __slots__ = ()
+    kind = GameEventKind.EVENT
+    value: str  # The string of the console event
 
     def __init__(self, message: str, source: str, generator: str) -> None:
-        self.generator = generator
+        # Names, weapons, sources and generators come from a small set that repeats constantly over a match, so they
+        # are interned - one shared copy of each, and equality checks between them short-circuit on identity.
+        self.generator = sys.intern(generator)
         self.value = message
-        self.source = source
+        self.source = sys.intern(source)
 
-        self.name = self.name.replace("?", self.generator)
+        self.name = f"ConsoleEventMessage({generator})"
 
     def __str__(self) -> str:
         return f"({self.source}) {self.name}::'{self.value}'"
 
 
 class ConsoleKillMessage(ConsoleEventMessage):
-    killer: SteamID | str = None
-    victim: SteamID | str = None
-    weapon: str = None
-    crit: bool = None
+    __slots__ = ("killer", "victim", "weapon", "crit")
+    kind = GameEventKind.KILL
+    killer: SteamID | str
+    victim: SteamID | str
+    weapon: str
+    crit: bool
 
     def __init__(self, regex_match: re.Match, source: str, generator: str) -> None:
         super().__init__("Kill Event Regex Match", source, generator)
-        _match_groups = regex_match.groups()
-        self.killer = _match_groups[0]
-        self.victim = _match_groups[1]
-        self.weapon = _match_groups[2]
-        self.crit = _match_groups[3] is not None
+        self.killer = sys.intern(regex_match.group("killer"))
+        self.victim = sys.intern(regex_match.group("victim"))
+        self.weapon = sys.intern(regex_match.group("weapon"))
+        self.crit = regex_match.group("crit") is not None
 
     def __str__(self) -> str:
         return (f"@[KillEvent: '{self.killer}' killed '{self.victim}' with '{self.weapon}' "
@@ -53,18 +78,19 @@ class ConsoleKillMessage(ConsoleEventMessage):
 
 
 class ConsoleChatMessage(ConsoleEventMessage):
-    author: SteamID | str = None
-    content: str = None
-    team: bool = None
-    dead: bool = None
+    __slots__ = ("author", "content", "team", "dead")
+    kind = GameEventKind.CHAT
+    author: SteamID | str
+    content: str
+    team: bool
+    dead: bool
 
     def __init__(self, regex_match: re.Match, source: str, generator: str) -> None:
         super().__init__("Chat Message Regex Match", source, generator)
-        _match_groups = regex_match.groups()
-        self.dead = _match_groups[0] is not None
-        self.team = _match_groups[1] is not None
-        self.author = _match_groups[2]
-        self.content = _match_groups[3]
+        self.dead = regex_match.group("dead") is not None
+        self.team = regex_match.group("team") is not None
+        self.author = sys.intern(regex_match.group("author"))
+        self.content = regex_match.group("content")
 
     def __str__(self):
         return (f"@[ChatMessage: '{self.author}'{' (dead)' if self.dead else ''} says '{self.content}' in "
@@ -0,0 +1,84 @@
+from collections import deque
+from queue import Empty
+from threading import Event
+from time import monotonic
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SPSCQueue(Generic[T]):
+    """
+    A queue for exactly one producer thread and exactly one consumer thread.
+
+    `deque.append` and `deque.popleft` are atomic in CPython, so the items themselves need no lock. The only
+    synchronisation is an Event the consumer waits on when the queue is empty, and the producer only sets it when the
+    consumer has cleared it - so while the consumer is keeping up, a put never touches a lock. `queue.Queue` instead
+    takes a mutex and signals a Condition on every put and every get.
+
+    Implements the parts of the `queue.Queue` interface the handlers use (there is no task_done/join), and raises
+    `queue.Empty` the same way. The queue is unbounded, so puts never block.
+    """
+    __slots__ = ("_items", "_not_empty")
+
+    def __init__(self) -> None:
+        self._items = deque()
+        self._not_empty = Event()
+
+    def put(self, item: T, block: bool = True, timeout: float | None = None) -> None:
+        """
+        Add an item to the queue. Never blocks - `block` and `timeout` are only accepted for `queue.Queue`
+        compatibility.
+
+        :param item: the item to enqueue.
+        :param block: ignored.
+        :param timeout: ignored.
+        :return: None
+        """
+        self._items.append(item)
+        # The consumer clears the event *before* its final emptiness check, so if it is still set here the consumer
+        # has not started waiting yet and will see this item without being woken.
+        if not self._not_empty.is_set():
+            self._not_empty.set()
+
+    def put_nowait(self, item: T) -> None:
+        self.put(item, block=False)
+
+    def get(self, block: bool = True, timeout: float | None = None) -> T:
+        """
+        Remove and return the oldest item in the queue.
+
+        :param block: if False, raise `queue.Empty` straight away when there is nothing to get.
+        :param timeout: if blocking, the most time in seconds to wait for an item before raising `queue.Empty`. None
+                        waits forever.
+        :return: the oldest item in the queue.
+        """
+        try:
+            return self._items.popleft()
+        except IndexError:
+            if not block:
+                raise Empty
+
+        _deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            self._not_empty.clear()
+            try:
+                return self._items.popleft()
+            except IndexError:
+                pass
+
+            if _deadline is None:
+                self._not_empty.wait()
+            else:
+                _remaining = _deadline - monotonic()
+                if _remaining <= 0 or not self._not_empty.wait(_remaining):
+                    raise Empty
+
+    def get_nowait(self) -> T:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
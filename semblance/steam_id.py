@@ -1,3 +1,7 @@
+import sys
+
+from functools import lru_cache
+from typing import Callable
 
 
 class SteamIDException(Exception):
@@ -22,14 +26,17 @@ class InvalidSteamID3Exception(SteamIDException):
 
 class SteamID:
     # Derived from https://gist.github.com/bcahue/4eae86ae1d10364bb66d
+    __slots__ = ("steam_id_1", "steam_id_3", "steam_id_64", "_input")
     _sid64_base: int = 76561197960265728
-    steam_id_1: str = None
-    steam_id_3: str = None
-    steam_id_64: int = None
-    _input: str = None
+    steam_id_1: str
+    steam_id_3: str
+    steam_id_64: int
+    _input: str
 
+    # Every SteamID format boils down to the same 32-bit account id (SteamID3's variable component), so each format
+    # is parsed to that once, and all three representations are formatted from it.
     @classmethod
-    def _sid64_to_sid1(cls, sid64: int | str) -> str:
+    def _sid64_to_account_id(cls, sid64: int | str) -> int:
         if isinstance(sid64, str):
             try:
                 _comm_id = int(sid64)
@@ -38,97 +45,66 @@ class SteamID:
         else:
             _comm_id = sid64
 
-        steam_id_acct = _comm_id - cls._sid64_base
-        return f"STEAM_0:{0 if steam_id_acct % 2 == 0 else 1}:{steam_id_acct // 2}"
-
-    @classmethod
-    def _sid1_to_sid64(cls, sid1: str) -> int:
-        _sid1_components = sid1.split(":")
-        try:
-            _comm_id = int(_sid1_components[-1])*2
-        except ValueError:
-            raise InvalidSteamID1Exception(f"SteamID1 of '{sid1}' is not a valid SteamID1. "
-                                           f"The last component must parse as an int.")
-
-        if _sid1_components[1] == '1':
-            _comm_id += 1
-
-        return _comm_id + cls._sid64_base
+        return _comm_id - cls._sid64_base
 
     @classmethod
-    def _sid1_to_sid3(cls, sid1: str) -> str:
+    def _sid1_to_account_id(cls, sid1: str) -> int:
         _sid1_components = sid1.split(":")
         try:
             _component_1 = int(_sid1_components[1])
             _component_2 = int(_sid1_components[2])
-        except ValueError:
+        except (ValueError, IndexError):
             raise InvalidSteamID1Exception(f"SteamID1 of '{sid1}' is not a valid SteamID1. "
                                            f"The middle and last components must parse as ints.")
 
-        return f"[U:1:{_component_2 * 2 + _component_1}]"
-
-    @classmethod
-    def _sid64_to_sid3(cls, sid64: int | str) -> str:
-        if isinstance(sid64, str):
-            try:
-                _comm_id = int(sid64)
-            except ValueError:
-                raise InvalidCommunityIDException(f"Community ID of '{sid64}' is not a valid community ID.")
-        else:
-            _comm_id = sid64
-
-        return f"[U:1:{_comm_id - cls._sid64_base}]"
+        return _component_2 * 2 + _component_1
 
     @classmethod
-    def _sid3_to_sid1(cls, sid3: str) -> str:
+    def _sid3_to_account_id(cls, sid3: str) -> int:
         _sid3 = sid3.replace("[", "").replace("]", "")
 
         try:
-            _comm_id = int(_sid3.split(":")[-1])
+            return int(_sid3.split(":")[-1])
         except ValueError:
             raise InvalidSteamID3Exception(f"SteamID13 of '{sid3}' is not a valid SteamID3. "
                                            f"The last component must parse as an int.")
 
-        return f"STEAM_0:{0 if _comm_id % 2 == 0 else 1}:{_comm_id // 2}"
+    # The formats are told apart by their first character alone - map it to the full prefix to verify, and the
+    # (unbound) parser for that format.
+    _PREFIX_DISPATCH: dict[str, tuple[str, Callable[[type, str], int]]] = {
+        "S": ("STEAM_0", _sid1_to_account_id.__func__),
+        "7": ("765611", _sid64_to_account_id.__func__),
+        "[": ("[U:1:", _sid3_to_account_id.__func__),
+    }
 
     @classmethod
-    def _sid3_to_sid64(cls, sid3: str) -> int:
-        _sid3 = sid3.replace("[", "").replace("]", "")
-
-        try:
-            _comm_id = int(_sid3.split(":")[-1])
-        except ValueError:
-            raise InvalidSteamID3Exception(f"SteamID13 of '{sid3}' is not a valid SteamID3. "
-                                           f"The last component must parse as an int.")
-
-        return _comm_id + cls._sid64_base
-
-    def _populate_other_fields(self) -> None:
-        if self.steam_id_1 is not None:
-            self.steam_id_3 = self._sid1_to_sid3(self.steam_id_1)
-            self.steam_id_64 = self._sid1_to_sid64(self.steam_id_1)
-        elif self.steam_id_3 is not None:
-            self.steam_id_1 = self._sid3_to_sid1(self.steam_id_3)
-            self.steam_id_64 = self._sid3_to_sid64(self.steam_id_3)
-        elif self.steam_id_64 is not None:
-            self.steam_id_1 = self._sid64_to_sid1(self.steam_id_64)
-            self.steam_id_3 = self._sid64_to_sid3(self.steam_id_64)
-        else:
-            raise ValueError(f"No identifiable/convertable steam ID was found")
+    def _parse(cls, steam_id_str: str) -> int:
+        _dispatch = cls._PREFIX_DISPATCH.get(steam_id_str[:1])
+        if _dispatch is None or not steam_id_str.startswith(_dispatch[0]):
+            raise SteamIDException(f"Could not identify what type of SteamID this is: '{steam_id_str}' - if its the "
+                                   f"variable component of a SteamID3, place it inside a [U:1:<var>].")
+        return _dispatch[1](cls, steam_id_str)
 
     def __init__(self, steam_id_str: str) -> None:
         self._input = steam_id_str
 
-        if steam_id_str.startswith("STEAM_0"):
-            self.steam_id_1 = steam_id_str
-        elif steam_id_str.startswith("765611"):
-            self.steam_id_64 = int(steam_id_str)
-        elif steam_id_str.startswith("[U:1:"):
-            self.steam_id_3 = steam_id_str
-        else:
-            raise SteamIDException(f"Could not identify what type of SteamID this is: '{steam_id_str}' - if its the "
-                                   f"variable component of a SteamID3, place it inside a [U:1:<var>].")
-        self._populate_other_fields()
+        _account_id = self._parse(steam_id_str)
+        # interned, as the same players' IDs get compared against each other over and over again
+        self.steam_id_1 = sys.intern(f"STEAM_0:{_account_id & 1}:{_account_id >> 1}")
+        self.steam_id_3 = sys.intern(f"[U:1:{_account_id}]")
+        self.steam_id_64 = _account_id + self._sid64_base
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def get(cls, steam_id_str: str) -> "SteamID":
+        """
+        Cached alternative to the constructor. The same players show up over and over again during a match, so repeat
+        IDs are only ever parsed once. The returned instances are shared, so don't modify them.
+
+        :param steam_id_str: A SteamID1, SteamID3 or SteamID64 (community ID) string.
+        :return: The SteamID for the given string.
+        """
+        return cls(steam_id_str)
 
     def get_profile_link(self):
         return f"https://steamcommunity.com/profiles/{self.steam_id_64}"
@@ -1,45 +1,54 @@
-import time
-from queue import Queue, Empty
-from threading import Thread
-from asyncio import sleep, wait_for, TimeoutError, new_event_loop, set_event_loop
-from typing import Awaitable, Any
+import os
+import stat
+import sys
+
+from math import ceil
+
+from threading import Thread, Event
+from asyncio import (sleep, timeout, gather, run, to_thread, TimeoutError, Lock, Task, TimerHandle, StreamReader,
+                     new_event_loop, get_running_loop, run_coroutine_threadsafe)
+from typing import Awaitable, Any, Callable, ValuesView
 
 # noinspection PyPackageRequirements
 from buttplug import Client, ProtocolSpec, WebsocketConnector, Device
 # noinspection PyPackageRequirements
-from buttplug.errors.client import WebsocketTimeoutError
+from buttplug.errors.client import WebsocketTimeoutError, ConnectorError, DisconnectedError
 # noinspection PyPackageRequirements
 from buttplug.client.client import Actuator, LinearActuator, RotatoryActuator
 from loguru import logger
 
-from semblance.control_messages import KillMessage, AbstractControlMessage, DummyMessage
+from semblance.spsc_queue import SPSCQueue
+from semblance.control_messages import AbstractControlMessage, ControlKind, KillMessage
 from semblance.device_messages import NormalActuatorSetIntensityMessage, ActuatorTypes, AbstractDeviceMessage
 
 
-async def await_with_timeout(awaitable_element: Awaitable, timeout: float, msg: str = "<anonymous>") -> Any:
+# Resolution to quantise regular actuator intensities to, for actuators that don't report their own step count
+_DEFAULT_INTENSITY_STEPS: int = 127
+
+
+async def await_with_timeout(awaitable_element: Awaitable, timeout_s: float, msg: str = "<anonymous>") -> Any:
     try:
-        result = await wait_for(awaitable_element, timeout)
-        return result
+        # Awaits in the current task - wait_for wraps the coroutine in a new Task first, on every device command.
+        async with timeout(timeout_s):
+            return await awaitable_element
     except TimeoutError as e:
-        logger.debug(f"Task '{msg}' timed out - {e}")
+        logger.debug("Task '{}' timed out - {}", msg, e)
         return None
 
 
-def handle_toy_client(
-        client_addr: str,
-        client_port: int,
-        message_queue: Queue[AbstractDeviceMessage],
-        control_queue: Queue[AbstractControlMessage]
-) -> None:
-    # Setup asyncio loops for this Thread
-    _async_el = new_event_loop()
-    set_event_loop(_async_el)
+async def connect_toy_client(client_addr: str, client_port: int) -> "ToyClientManager":
+    """
+    Connect to the Intiface server, and keep scanning until at least one device shows up.
 
+    :param client_addr: the address of the Intiface websocket server.
+    :param client_port: the port of the Intiface websocket server.
+    :return: the connected ToyClientManager, with its target_device set.
+    """
     _client = ToyClientManager(client_addr, client_port)
-    _async_el.run_until_complete(_client.handshake())
+    await _client.handshake()
     while len(_client.client.devices) < 1:
         logger.error(f"No connected devices were found... scanning...")
-        _async_el.run_until_complete(_client.scan_devices())
+        await _client.scan_devices()
 
     logger.success(f"Connected with {len(_client.client.devices)} devices.")
     _active_dev = _client.target_device
@@ -52,55 +61,82 @@ def handle_toy_client(
                    f"  - {len(_active_dev.rotatory_actuators)} rotary actuators\n"
                    f"  - {len(_active_dev.linear_actuators)} linear actuators\n"
                    f"  - and {len(_active_dev.sensors)} sensors.")
+    return _client
+
+
+def handle_toy_client(
+        client_addr: str,
+        client_port: int,
+        message_queue: SPSCQueue[AbstractDeviceMessage | AbstractControlMessage],
+        ready_event: Event | None = None
+) -> None:
+    # One event loop that runs for the lifetime of the handler, on its own thread. This thread only shuttles messages
+    # from the queue onto it, so the websocket (and buttplug's pings) keep getting serviced between commands, and we
+    # don't pay to start and stop the loop for every message.
+    _async_el = new_event_loop()
+    _loop_thread = Thread(target=_async_el.run_forever, name="ToyClientEventLoopThread", daemon=True)
+    _loop_thread.start()
+
+    def _run(coro: Awaitable) -> Any:
+        # Waiting on the result keeps commands applied one at a time, in the order they were queued.
+        return run_coroutine_threadsafe(coro, _async_el).result()
+
+    _client = _run(connect_toy_client(client_addr, client_port))
+    _active_dev = _client.target_device
+    if ready_event is not None:
+        ready_event.set()
 
-    _last_connection_check = time.time()
+    # A message taken off the queue while coalescing that wasn't a set command - handled next, before the queue.
+    _pending = None
     while True:
+        if _pending is not None:
+            _message, _pending = _pending, None
+        else:
+            # Sleep until there is something to do. Control messages share the queue with device messages, so a kill
+            # still wakes us straight away. The connection checks run on the event loop by themselves.
+            _message = message_queue.get()
+
         # ================================================
         # Control the handler...
         # ------------------------------------------------
-        try:
-            _control_msg = control_queue.get(block=False)
-            if isinstance(_control_msg, KillMessage):
-                logger.info(f"Received kill signal from {_control_msg.generator}. Ending...")
+        if isinstance(_message, AbstractControlMessage):
+            _kind = _message.kind
+            if _kind == ControlKind.KILL:
+                logger.info(f"Received kill signal from {_message.generator}. Ending...")
                 break
-            elif isinstance(_control_msg, DummyMessage):
-                pass  # DummyMessage, ignore it! (but still make sure to mark task_done)
+            elif _kind == ControlKind.DUMMY:
+                pass  # DummyMessage, ignore it!
             else:
-                logger.warning(f"handle_toy_client loop received control message '{_control_msg.name}' but cannot "
+                logger.warning(f"handle_toy_client loop received control message '{_message.name}' but cannot "
                                f"handle it. Ignoring...")
-
-            control_queue.task_done()
-        except Empty:
-            pass  # no control messages right now...
         # ================================================
-        try:
-            _message = message_queue.get(block=False)
-            if isinstance(_message, NormalActuatorSetIntensityMessage):
-                logger.debug(f"Received a regular actuator set command: {_message.name}")
-                match _message.target:
-                    case ActuatorTypes.NORMAL:
-                        _async_el.run_until_complete(_client.apply_normal_intensity(_active_dev, _message.value))
-                        _last_connection_check = time.time()
-                    case _:
-                        logger.error(f"Received a NormalActuatorSetIntensity message, but the target was not a NORMAL "
-                                     f"actuator. target={_message.target}, name={_message.name}.")
-
-            message_queue.task_done()
-        except Empty:
-            _time_now = time.time()
-            if _time_now - _last_connection_check > 5:
-                logger.info(f"running scheduled connection check.")
-                _async_el.run_until_complete(_client.ensure_connected())
-                _last_connection_check = _time_now
+        elif isinstance(_message, NormalActuatorSetIntensityMessage):
+            logger.debug("Received a regular actuator set command: {}", _message.name)
+            if _message.target is ActuatorTypes.NORMAL:
+                # Only the latest intensity matters, so if more set commands queued up while we were busy with the
+                # last one, skip straight to the newest rather than sending each of them to the device.
+                # We're the only consumer, so whatever qsize reports is there for get_nowait to take.
+                while message_queue.qsize():
+                    _next = message_queue.get_nowait()
+                    if isinstance(_next, NormalActuatorSetIntensityMessage) and _next.target is ActuatorTypes.NORMAL:
+                        _message = _next
+                    else:
+                        _pending = _next
+                        break
+
+                _run(_client.apply_intensity_regular(_active_dev, _message.value))
+            else:
+                logger.error("Received a NormalActuatorSetIntensity message, but the target was not a NORMAL "
+                             "actuator. target={}, name={}.", _message.target, _message.name)
 
     logger.info(f"Exiting the ToyClientHandler loop...")
 
     logger.debug(f"Killing the Intiface Client connection...")
-    _async_el.run_until_complete(_client.client.stop_all())
-    _async_el.run_until_complete(_client.client.disconnect())
+    _run(_client.close())
 
     logger.debug(f"Killing the Async Event loop...")
-    _async_el.stop()
+    _async_el.call_soon_threadsafe(_async_el.stop)
+    _loop_thread.join()
     _async_el.close()
 
     logger.info(f"ToyClientHandler is closed! Goodbye.")
@@ -108,69 +144,214 @@ def handle_toy_client(
 
 
 class ToyClientManager:
-    client: Client = None
-    _address: str = None
-    connector: WebsocketConnector = None
-    devices: list[Device] = None
-    target_device: Device = None
+    __slots__ = ("client", "_address", "connector", "target_device", "_target_actuators", "_health_handle",
+                 "_health_task", "_dispatch", "_last_sent", "_regular_commands",
+                 "_reconnect_lock")
+    client: Client
+    _address: str
+    connector: WebsocketConnector
+    target_device: Device | None
+    # The target device's (regular, rotary, linear) actuators. buttplug builds a new tuple every time one of these is
+    # read off the device, so they're taken once per scan.
+    _target_actuators: tuple[tuple[Actuator, ...], tuple[RotatoryActuator, ...], tuple[LinearActuator, ...]] | None
+    # Periodic connection check, scheduled on the event loop once we're connected
+    _health_interval: float = 5.0
+    _health_handle: TimerHandle | None
+    _health_task: Task | None
+    # Actuator type -> the applicator for it (None for types that aren't actuators)
+    _dispatch: dict[type, Callable[..., Awaitable[None]] | None]
+    # Regular actuator -> the step we last successfully set it to
+    _last_sent: dict[Actuator, int]
+    # Regular actuator -> its bound command method, and its step count
+    _regular_commands: dict[Actuator, tuple[Callable[[float], Awaitable[None]], int]]
+    # Held while reconnecting, so concurrent callers (each actuator's retries, the health check) only reconnect once
+    _reconnect_lock: Lock
 
     def __init__(self, websocket_address: str = "127.0.0.1", websocket_port: int = 12345) -> None:
-        self.devices = []
         self.client = Client("Semblance Client", ProtocolSpec.v3)
         self._address = f"ws://{websocket_address}:{websocket_port}"
         self.connector = WebsocketConnector(self._address)
+        self.target_device = None
+        self._target_actuators = None
+        self._health_handle = None
+        self._health_task = None
+        self._last_sent = {}
+        self._regular_commands = {}
+        self._reconnect_lock = Lock()
+        self._dispatch = {
+            Actuator: self._apply_intensity_actuator,
+            RotatoryActuator: self._apply_intensity_rotary,
+            LinearActuator: self._apply_intensity_linear,
+        }
+
+    def _get_applicator(self, actuator_type: type) -> Callable[..., Awaitable[None]] | None:
+        try:
+            return self._dispatch[actuator_type]
+        except KeyError:
+            pass
+
+        # The device hands us concrete subclasses (e.g. ScalarActuator), so the first time we see a type, find the
+        # closest of our base types in its MRO and remember it. Linear and rotary actuators are Actuators too, so
+        # this has to go by MRO order rather than the first isinstance match.
+        _applicator = None
+        for _base in actuator_type.__mro__:
+            if _base in self._dispatch:
+                _applicator = self._dispatch[_base]
+                break
+        self._dispatch[actuator_type] = _applicator
+        return _applicator
 
     async def scan_devices(self) -> None:
         if self.client is None or not self.client.connected:
             logger.error(f"Cannot scan for devices with a null client/unconnected client.")
             raise ValueError(f"Client not in valid state for scanning.")
 
+        _client = self.client
         logger.info(f"Scanning for devices...")
-        await self.client.start_scanning()
+        await _client.start_scanning()
         await sleep(3.0)
-        await self.client.stop_scanning()
-        logger.success(f"Finished scan. Found {len(self.client.devices)} devices.")
-        self.target_device = list(self.client.devices.values())[0]
+        await _client.stop_scanning()
+        _devices = _client.devices
+        logger.success(f"Finished scan. Found {len(_devices)} devices.")
+        # The first device, without copying all of them into a list - and None (rather than an IndexError) if the scan
+        # didn't find any.
+        _target = next(iter(_devices.values()), None)
+        self.target_device = _target
+        self._last_sent.clear()
+        self._regular_commands.clear()
+        if _target is not None:
+            self._target_actuators = self._actuator_groups(_target)
+            for _act in self._target_actuators[0]:
+                self._bind_regular_command(_act)
+        else:
+            # Don't leave the previous device's actuators cached to be commanded
+            self._target_actuators = None
+
+    def _bind_regular_command(self, actuator: Actuator) -> tuple[Callable[[float], Awaitable[None]], int]:
+        # step_count is a property, and command a fresh bound method, on every access - so look both up once
+        _binding = (actuator.command, actuator.step_count or _DEFAULT_INTENSITY_STEPS)
+        self._regular_commands[actuator] = _binding
+        return _binding
+
+    @property
+    def devices(self) -> ValuesView[Device]:
+        return self.client.devices.values()
+
+    @staticmethod
+    def _actuator_groups(
+            device: Device
+    ) -> tuple[tuple[Actuator, ...], tuple[RotatoryActuator, ...], tuple[LinearActuator, ...]]:
+        return device.actuators, device.rotatory_actuators, device.linear_actuators
 
     async def handshake(self) -> None:
-        if self.connector is None:
+        _client = self.client
+        _connector = self.connector
+        if _connector is None:
             logger.error(f"Cannot perform handshake connect because connector is not defined.")
             raise ValueError(f"Connector is None.")
 
-        if self.connector.connected:
+        if _connector.connected:
             logger.info(f"Existing connection found - resetting connection.")
-            await await_with_timeout(self.client.stop_all(), 5.0, "Client StopAll")
-            await self.client.disconnect()
+            await await_with_timeout(_client.stop_all(), 5.0, "Client StopAll")
+            await _client.disconnect()
 
         try:
-            await self.client.connect(self.connector)
+            await _client.connect(_connector)
         except Exception as e:
-            logger.error(f"Could not connect to WS server at {self.connector} because '{e}'. Aborting.")
+            logger.error(f"Could not connect to WS server at {_connector} because '{e}'. Aborting.")
             raise WebsocketTimeoutError(self._address)
 
         await self.scan_devices()
-        self.devices = list(self.client.devices.values())
+
+        self.stop_health_checks()
+        self._health_handle = get_running_loop().call_later(self._health_interval, self._health_tick)
+
+    def _health_tick(self) -> None:
+        # Runs on the event loop every _health_interval seconds. A check still in flight (e.g. a slow reconnect) isn't
+        # doubled up on.
+        _loop = get_running_loop()
+        _task = self._health_task
+        if _task is None or _task.done():
+            logger.info("running scheduled connection check.")
+            self._health_task = _loop.create_task(self.ensure_connected())
+            self._health_task.add_done_callback(self._health_check_done)
+        self._health_handle = _loop.call_later(self._health_interval, self._health_tick)
+
+    @staticmethod
+    def _health_check_done(task: Task) -> None:
+        # Nothing awaits the check, so retrieve anything it raised here - otherwise asyncio dumps a "Task exception
+        # was never retrieved" traceback for it instead of it going through our logger.
+        if task.cancelled():
+            return
+        _exc = task.exception()
+        if _exc is not None:
+            logger.error("Scheduled connection check failed: {!r}", _exc)
+
+    def stop_health_checks(self) -> None:
+        """
+        Stop the periodic connection check. Must be called from the event loop's thread.
+
+        :return: None
+        """
+        if self._health_handle is not None:
+            self._health_handle.cancel()
+            self._health_handle = None
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    async def close(self) -> None:
+        """
+        Stop the connection checks, stop every device, and disconnect from the Intiface server.
+
+        :return: None
+        """
+        self.stop_health_checks()
+        await self.client.stop_all()
+        await self.client.disconnect()
 
     async def ensure_connected(self) -> bool:
-        if not self.client.connected:
-            logger.warning(f"Client is in a disconnected state. Issuing reconnect")
+        _client = self.client
+        if _client.connected:
+            return True
+
+        async with self._reconnect_lock:
+            # Someone else may have reconnected while we waited for the lock - reconnecting again would rebuild the
+            # devices and start another ping task.
+            if _client.connected:
+                return True
+
+            logger.warning("Client is in a disconnected state. Issuing reconnect")
             try:
-                await await_with_timeout(self.client.reconnect(), 1.0, "Client Reconnect")
+                async with timeout(1.0):
+                    await _client.reconnect()
+                # We can't know what state the device came back in, so don't skip any commands as already sent
+                self._last_sent.clear()
                 return True
             except TimeoutError:
-                logger.error(f"Client failed to reconnect (timed out).")
+                logger.error("Client failed to reconnect (timed out).")
+                return False
+            except ConnectorError as e:
+                # e.g. Intiface isn't running - let the caller decide whether to try again
+                logger.error("Client failed to reconnect: {}", e)
                 return False
-        return True
 
-    async def apply_normal_intensity(self, device: Device, intensity: float) -> None:
+    async def apply_intensity_regular(self, device: Device, intensity: float) -> None:
         """
-        Wraps self.apply_intensity, providing a tuple for the regular argument, and no others.
+        Apply an intensity to every regular actuator on the given device. The same as
+        `apply_intensity(device, regular=(intensity,))`, without checking for the rotary and linear groups that this
+        path never commands.
 
         :param device: The device to apply this intensity to.
         :param intensity: a float between 0 and 1 inclusive for the intensity value
         :return: None
         """
-        await self.apply_intensity(device, regular=(intensity,))
+        logger.debug("Applying intensity for {}.", device.name)
+        if device is self.target_device:
+            _regular_acts = self._target_actuators[0]
+        else:
+            _regular_acts = device.actuators
+        await self._apply_intensity_group(_regular_acts, (intensity,), "regular")
 
     async def apply_intensity(
             self,
@@ -180,11 +361,10 @@ class ToyClientManager:
             linear: tuple | None = None
     ) -> None:
         """
-        Apply a command ('intensity') to a set of actuators on the given device. If the device disconnects or the
-        commands fully time out, this method will abort attempting to apply the commands to any other actuator in the
-        same group. If the device disconnects, there are 3 reconnect attempts before the command is aborted. If a
-        command times out, the device is checked for its connection status. If a command times out 3 times, the command
-        is aborted.
+        Apply a command ('intensity') to a set of actuators on the given device. The commands are independent sends, so
+        every actuator (in every group) is commanded concurrently, and this returns once they have all finished. If the
+        device disconnects, there are 3 reconnect attempts before the command is aborted. If a command times out, the
+        device is checked for its connection status. If a command times out 3 times, the command is aborted.
 
         :param device: The device to run commands against.
         :param regular: If not None, will use this argument as an arg tuple for applying intensity to all regular
@@ -195,25 +375,30 @@ class ToyClientManager:
                         actuators on this device. If None, no linear actuators are commanded.
         :return: None
         """
-        logger.debug(f"Applying intensity for {device.name}.")
+        logger.debug("Applying intensity for {}.", device.name)
+        if device is self.target_device:
+            _regular_acts, _rotary_acts, _linear_acts = self._target_actuators
+        else:
+            _regular_acts, _rotary_acts, _linear_acts = self._actuator_groups(device)
+
+        _apply_group = self._apply_intensity_group
+        _groups = []
         if regular:
-            for act in device.actuators:
-                _val = await self._apply_intensity(act, *regular)
-                if not _val:
-                    logger.error(f"Could not send command for a 'regular' actuator - aborted.")
-                    break  # Abort - something went wrong, and we really couldn't run the commands...
+            _groups.append(_apply_group(_regular_acts, regular, "regular"))
         if rotary:
-            for rotact in device.rotatory_actuators:
-                _val = await self._apply_intensity(rotact, *rotary)
-                if not _val:
-                    logger.error(f"Could not send command for a rotary actuator - aborted.")
-                    break  # Abort - something went wrong, and we really couldn't run the commands...
+            _groups.append(_apply_group(_rotary_acts, rotary, "rotary"))
         if linear:
-            for linact in device.linear_actuators:
-                _val = await self._apply_intensity(linact, *linear)
-                if not _val:
-                    logger.error(f"Could not send command for a linear actuator - aborted.")
-                    break  # Abort - something went wrong, and we really couldn't run the commands...
+            _groups.append(_apply_group(_linear_acts, linear, "linear"))
+        await gather(*_groups)
+
+    async def _apply_intensity_group(self, actuators: tuple[Actuator, ...], args: tuple, group_name: str) -> None:
+        _apply = self._apply_intensity
+        _results = await gather(*(_apply(_act, *args) for _act in actuators), return_exceptions=True)
+        for _res in _results:
+            if isinstance(_res, BaseException):
+                logger.error("Sending a command to a {} actuator raised '{}'.", group_name, _res)
+            elif not _res:
+                logger.error("Could not send command for a {} actuator (gave up retrying).", group_name)
 
     async def _apply_intensity(self, actuator: Actuator | LinearActuator | RotatoryActuator, *args) -> bool:
         """
@@ -231,124 +416,265 @@ class ToyClientManager:
                      For a rotary actuator, this is a floating speed, and bool for clockwise (false is CCW)
         :return: None
         """
+        _applicator = self._get_applicator(type(actuator))
+        if _applicator is None:
+            logger.warning("Attempted to apply intensity on a non-actuator object: {}.", actuator)
+            # do nothing
+            return True
+
+        try:
+            await _applicator(actuator, *args)
+            return True
+        except (TimeoutError, DisconnectedError):
+            # Only a command that actually timed out (or hit a dropped connection) pays for the retry bookkeeping
+            return await self._retry_with_reconnect(_applicator, actuator, args)
+
+    async def _retry_with_reconnect(
+            self,
+            applicator: Callable[..., Awaitable[None]],
+            actuator: Actuator | LinearActuator | RotatoryActuator,
+            args: tuple
+    ) -> bool:
+        """
+        The slow path of _apply_intensity, once the first attempt at the command has timed out or found the connection
+        down. Checks the connection (reconnecting up to 3 times) before each retry, and retries the command up to 3
+        times in total.
+
+        :param applicator: the applicator function for this actuator's type.
+        :param actuator: the actuator the command failed on.
+        :param args: the args for the applicator, as given to _apply_intensity.
+        :return: True if a retry succeeded, False if we gave up.
+        """
         _retry_attempt = 1
         _extra_go_tried = False
         _max_retries = 3
-        while _retry_attempt <= _max_retries:
-            try:
-                if isinstance(actuator, Actuator):
-                    await self._apply_intensity_actuator(actuator, *args)
-                elif isinstance(actuator, RotatoryActuator):
-                    await self._apply_intensity_rotary(actuator, *args)
-                elif isinstance(actuator, LinearActuator):
-                    await self._apply_intensity_linear(actuator, *args)
-                else:
-                    logger.warning(f"Attempted to apply intensity on a non-actuator object: {actuator}.")
-                    # do nothing
-                return True
-            except TimeoutError:
-                logger.warning(f"Timed out attempting to apply an intensity to an actuator. "
-                               f"(attempt {_retry_attempt}/{_max_retries})")
-                _reconnect_attempts = 1
-                _max_reconnect_retries = 3
-                _success = False
-                while _reconnect_attempts <= _max_reconnect_retries:
-                    _res = await self.ensure_connected()
-                    if _res:
-                        logger.success(f"Reconnected successfully.")
-                        _success = True
-                        break
-                    else:
-                        _reconnect_attempts += 1
-                if not _success:
-                    # Abort attempt at applying intensity - reconnect failed.
-                    logger.error(f"Could not connect to device, aborting intensity application.")
-                    return False
-                # If we 'succeed' on the reconnect, but we have already tried the max num of times, we get one 'extra'
-                # go to attempt to apply the intensity.
-                if _success and _retry_attempt == _max_retries and not _extra_go_tried:
-                    _extra_go_tried = True
+        _ensure_connected = self.ensure_connected
+        while True:
+            logger.warning("Failed to apply an intensity to an actuator (timed out or disconnected). (attempt {}/{})",
+                           _retry_attempt, _max_retries)
+            _reconnect_attempts = 1
+            _max_reconnect_retries = 3
+            _success = False
+            while _reconnect_attempts <= _max_reconnect_retries:
+                _res = await _ensure_connected()
+                if _res:
+                    logger.success("Reconnected successfully.")
+                    _success = True
+                    break
                 else:
-                    _retry_attempt += 1
-        return False
+                    _reconnect_attempts += 1
+            if not _success:
+                # Abort attempt at applying intensity - reconnect failed.
+                logger.error("Could not connect to device, aborting intensity application.")
+                return False
+            # If we 'succeed' on the reconnect, but we have already tried the max num of times, we get one 'extra'
+            # go to attempt to apply the intensity.
+            if _retry_attempt == _max_retries and not _extra_go_tried:
+                _extra_go_tried = True
+            else:
+                _retry_attempt += 1
+            if _retry_attempt > _max_retries:
+                return False
 
-    @staticmethod
-    async def _apply_intensity_actuator(actuator: Actuator, intensity_value: float) -> None:
-        _inten = intensity_value
-        if not 0.0 <= _inten <= 1.0:
-            logger.warning(f"given intensity value is out of range, clamping!")
-            _inten = max(0.0, min(1.0, _inten))
+            try:
+                await applicator(actuator, *args)
+                return True
+            except (TimeoutError, DisconnectedError):
+                pass
 
-        await await_with_timeout(actuator.command(_inten), 0.3)
+    async def _apply_intensity_actuator(self, actuator: Actuator, intensity_value: float) -> None:
+        # intensity_value is already in range - NormalActuatorSetIntensityMessage clamps it when it's created.
+
+        # Bound when the target device was scanned - anything else gets bound the first time it's commanded.
+        _binding = self._regular_commands.get(actuator)
+        if _binding is None:
+            _binding = self._bind_regular_command(actuator)
+        _command, _steps = _binding
+
+        # The device only has so many distinct intensities - if this one lands on the same step as the last one we
+        # set, sending it again would change nothing. The step is only used to spot repeats: the device is still sent
+        # the value we were asked for. Intiface picks the step by rounding up, so we key on the same mapping - anything
+        # else would treat some real changes (e.g. 0.51 -> 0.5 on a 20 step actuator) as repeats.
+        _step = ceil(intensity_value * _steps) if intensity_value >= 1e-4 else 0
+        _last_sent = self._last_sent
+        if _last_sent.get(actuator) == _step:
+            return
+        # Until this send succeeds, we don't know which step the actuator is on.
+        _last_sent.pop(actuator, None)
+
+        # No await_with_timeout here (or in the other applicators) - it would swallow the TimeoutError that
+        # _apply_intensity retries on.
+        async with timeout(0.3):
+            await _command(intensity_value)
+        _last_sent[actuator] = _step
 
     @staticmethod
     async def _apply_intensity_rotary(actuator: RotatoryActuator, speed: float, clockwise: bool = True) -> None:
-        await await_with_timeout(actuator.command(speed, clockwise), 0.3)
+        async with timeout(0.3):
+            await actuator.command(speed, clockwise)
 
     @staticmethod
     async def _apply_intensity_linear(actuator: LinearActuator, duration: int, position: float) -> None:
-        await await_with_timeout(actuator.command(duration, position), 0.3)
+        async with timeout(0.3):
+            await actuator.command(duration, position)
 
 
 def print_main_control_help():
     print("Test Control Loop Commands:")
     print("  help        - print this message")
-    print("  exit        - exit the loop, send the kill signal to the handlers.")
+    print("  exit        - exit the loop, and disconnect from the toy.")
     print("  set [float] - set the intensity on the connected toy to the given value (float between 0 and 1)")
     print("  get         - get (print) the current intensity value")
     return
 
 
-def main():
-    _control_queue = Queue()
-    _control_queue.put(DummyMessage("MainTestThread-init"))
-    _message_queue = Queue()
+def _parse_set_command(words: list[str]) -> NormalActuatorSetIntensityMessage | None:
+    # Builds the message for a 'set [float]' command, or prints what was wrong with it and returns None.
+    if not len(words) > 1:
+        print(f"Provide a float value! e.g.: set 0.34")
+        return None
+    try:
+        _val = float(words[1])
+    except ValueError:
+        print(f"Error - {words[1]} is not a valid float value!")
+        return None
+    return NormalActuatorSetIntensityMessage(_val, "MainTestLoop(setCommand)")
+
+
+def _open_stdin_reader() -> tuple[Callable[[], Awaitable[str]], Callable[[], None]]:
+    # Returns a coroutine function that reads the next line from stdin ("" at EOF) without blocking the event loop,
+    # and a function to stop reading stdin. Must be called from the event loop's thread.
+    if sys.platform == "win32":
+        # The proactor loop can't watch the console for input, so each line is read on a worker thread instead.
+        return lambda: to_thread(sys.stdin.readline), lambda: None
+
+    _fd = sys.stdin.fileno()
+    if stat.S_ISREG(os.fstat(_fd).st_mode):
+        # Reading a file never blocks (and the selector won't watch one anyway), so just read it.
+        async def _read_file_line() -> str:
+            return sys.stdin.readline()
+
+        return _read_file_line, lambda: None
+
+    _loop = get_running_loop()
+    _reader = StreamReader()
+
+    def _on_readable() -> None:
+        # Only called once the selector says there's input, so this read doesn't block. Unlike connect_read_pipe, this
+        # leaves the fd in blocking mode - on a tty it's shared with stdout, which our prints rely on.
+        _data = os.read(_fd, 4096)
+        if _data:
+            _reader.feed_data(_data)
+        else:
+            _loop.remove_reader(_fd)
+            _reader.feed_eof()
+
+    _loop.add_reader(_fd, _on_readable)
+
+    async def _readline() -> str:
+        return (await _reader.readline()).decode(errors="ignore")
+
+    return _readline, lambda: _loop.remove_reader(_fd)
+
+
+async def main():
+    # The test loop drives the client directly on one event loop - no handler thread, and no queue in between.
+    _url = "localhost"
+    _port = 12345
+    logger.info("Connecting to the toy client...")
+    _client = await connect_toy_client(_url, _port)
+    _active_dev = _client.target_device
+    _readline, _close_stdin = _open_stdin_reader()
+
+    # A Ctrl-C cancels us while waiting on a line, so still disconnect on the way out
+    try:
+        while True:
+            print("Enter Command >> ", end="", flush=True)
+            _line = await _readline()
+            if not _line:
+                logger.info("EOF detected. Exiting...")
+                break
+            _input = _line.strip().lower()
+            if len(_input) < 1:
+                continue
+
+            _words = _input.split()
+            match _words[0]:
+                case "help":
+                    print_main_control_help()
+                case "exit":
+                    break
+                case "get":
+                    pass
+                case "set":
+                    _msg = _parse_set_command(_words)
+                    if _msg is not None:
+                        await _client.apply_intensity_regular(_active_dev, _msg.value)
+    finally:
+        _close_stdin()
+        await _client.close()
+    logger.success(f"Disconnected, exiting now, bye bye!")
+    return
+
+
+def main_threaded():
+    # The same test loop, but driving the client through handle_toy_client - a handler thread fed by a queue - for
+    # callers that aren't running an event loop of their own.
+    # One producer (this thread) and one consumer (the handler), so the lock-free SPSC queue will do. It's FIFO, so the
+    # KillMessage is only seen once everything queued before it has been handled.
+    _message_queue = SPSCQueue()
+    _ready = Event()
     _url = "localhost"
     _port = 12345
     logger.info("Starting toy client thread...")
     _control_thread = Thread(
         target=handle_toy_client,
         name="IntifaceToyClientHandlerThread",
-        args=(_url, _port, _message_queue, _control_queue)
+        args=(_url, _port, _message_queue, _ready)
     )
     _control_thread.start()
     logger.success(f"Thread '{_control_thread.name}' started.")
 
-    _control_queue.join()
-    while True:
-        try:
-            _input = input("Enter Command >> ").strip().lower()
-        except EOFError:
-            logger.info("EOF detected. Exiting...")
-            break
-        if len(_input) < 1:
-            continue
-
-        _words = _input.split()
-        match _words[0]:
-            case "help":
-                print_main_control_help()
-            case "exit":
+    # Don't prompt for commands until the handler has connected to a device (or died trying)
+    while not _ready.wait(0.5):
+        if not _control_thread.is_alive():
+            logger.warning("We detected that the ToyClientHandler thread died before connecting... exiting.")
+            _control_thread.join()
+            return
+
+    try:
+        while True:
+            try:
+                _input = input("Enter Command >> ").strip().lower()
+            except EOFError:
+                logger.info("EOF detected. Exiting...")
                 break
-            case "get":
-                pass
-            case "set":
-                if not len(_words) > 1:
-                    print(f"Provide a float value! e.g.: set 0.34")
-                else:
-                    try:
-                        _val = float(_words[1])
-                        _msg = NormalActuatorSetIntensityMessage(_val, "MainTestLoop(setCommand)")
-                        _message_queue.put(_msg, block=True)
-                    except ValueError:
-                        print(f"Error - {_words[1]} is not a valid float value!")
-
-    _message_queue.join()
-    _control_queue.put(KillMessage("MainTestMethod"), block=True)
+            if len(_input) < 1:
+                continue
+
+            _words = _input.split()
+            match _words[0]:
+                case "help":
+                    print_main_control_help()
+                case "exit":
+                    break
+                case "get":
+                    pass
+                case "set":
+                    _msg = _parse_set_command(_words)
+                    if _msg is not None:
+                        _message_queue.put(_msg)
+    except KeyboardInterrupt:
+        logger.info("Keyboard interrupt detected, exiting...")
+
+    _message_queue.put(KillMessage("MainTestMethod"))
     _control_thread.join()
     logger.success(f"KillMessage successful, exiting now, bye bye!")
     return
 
 
 if __name__ == "__main__":
-    main()
+    if "--threaded" in sys.argv[1:]:
+        main_threaded()
+    else:
+        run(main())